@@ -13,7 +13,11 @@ from config.settings import settings
 
 
 class RealtimeVoiceBridge:
-    """实时语音桥接器"""
+    """实时语音桥接器
+    
+    on_audio_received 的调用线程和分块方式与 IntegratedVoiceSession 相同：
+    在事件循环线程中调用，流式解压的音频帧可能分多次回调。
+    """
     
     def __init__(self, 
                  on_text_received: Callable[[str], None] = None,
@@ -3,6 +3,7 @@
 """
 
 import asyncio
+import binascii
 import queue
 import threading
 import time
@@ -11,6 +12,7 @@ from typing import Optional, Callable, Dict, Any
 from dataclasses import dataclass
 import os
 import concurrent.futures
+import contextlib
 
 # 尝试导入pyaudio，如果不可用则使用模拟模式
 try:
@@ -22,8 +24,20 @@ except ImportError:
     PYAUDIO_AVAILABLE = False
     logging.info("PyAudio不可用，将使用模拟音频模式（语音服务仍可正常工作）")
 
+# 输入/输出采样格式，模拟模式下以位宽代替PyAudio格式常量
+INPUT_BIT_SIZE = pyaudio.paInt16 if PYAUDIO_AVAILABLE else 16
+OUTPUT_BIT_SIZE = pyaudio.paFloat32 if PYAUDIO_AVAILABLE else 32
+
+# 服务端TTS默认输出采样率
+DEFAULT_TTS_SAMPLE_RATE = 24000
+
+# 播放队列最多缓存的音频时长（秒），超出后丢弃最旧的音频
+PLAYBACK_QUEUE_SECONDS = 3
+
 from .voice_client import VoiceServiceClient
-from .voice_protocol import VoiceMessage
+from .voice_protocol import VoiceMessage, AudioBuffer
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -34,6 +48,20 @@ class AudioConfig:
     channels: int
     sample_rate: int
     chunk: int
+    # 设备缓冲时长（毫秒），为空时直接使用chunk作为缓冲帧数
+    latency_ms: Optional[float] = None
+    
+    def __post_init__(self):
+        if self.latency_ms is not None and not self.latency_ms > 0:
+            raise ValueError(f"latency_ms必须为正数: {self.latency_ms}")
+    
+    @property
+    def frames_per_buffer(self) -> int:
+        """设备缓冲帧数，按latency_ms换算并向下取整到2的幂（最少64帧）"""
+        if self.latency_ms is None:
+            return self.chunk
+        frames = max(64, int(self.sample_rate * self.latency_ms / 1000))
+        return 1 << (frames.bit_length() - 1)
 
 
 class AudioDeviceManager:
@@ -42,7 +70,6 @@ class AudioDeviceManager:
     def __init__(self, input_config: AudioConfig, output_config: AudioConfig):
         self.input_config = input_config
         self.output_config = output_config
-        self.logger = logging.getLogger(__name__)
         
         # PyAudio实例
         self.pyaudio_instance = None
@@ -53,17 +80,17 @@ class AudioDeviceManager:
         if PYAUDIO_AVAILABLE:
             try:
                 self.pyaudio_instance = pyaudio.PyAudio()
-                self.logger.info("PyAudio初始化成功")
+                logger.info("PyAudio初始化成功")
             except Exception as e:
-                self.logger.error(f"PyAudio初始化失败: {e}")
+                logger.error("PyAudio初始化失败: %s", e)
                 self.pyaudio_instance = None
         else:
-            self.logger.info("使用模拟音频模式")
+            logger.info("使用模拟音频模式")
     
     def open_input_stream(self):
         """打开音频输入流"""
         if not PYAUDIO_AVAILABLE or not self.pyaudio_instance:
-            self.logger.info("模拟打开音频输入流")
+            logger.info("模拟打开音频输入流")
             return None
         
         try:
@@ -72,32 +99,52 @@ class AudioDeviceManager:
                 channels=self.input_config.channels,
                 rate=self.input_config.sample_rate,
                 input=True,
-                frames_per_buffer=self.input_config.chunk
+                frames_per_buffer=self.input_config.frames_per_buffer
             )
-            self.logger.info("音频输入流已打开")
+            logger.info("音频输入流已打开")
             return self.input_stream
         except Exception as e:
-            self.logger.error(f"打开音频输入流失败: {e}")
+            logger.error("打开音频输入流失败: %s", e)
+            return None
+    
+    def get_default_output_rate(self) -> Optional[int]:
+        """获取默认输出设备的原生采样率"""
+        if not PYAUDIO_AVAILABLE or not self.pyaudio_instance:
+            return None
+        
+        try:
+            info = self.pyaudio_instance.get_default_output_device_info()
+            return int(info['defaultSampleRate'])
+        except Exception as e:
+            logger.warning("获取默认输出设备信息失败: %s", e)
             return None
     
     def open_output_stream(self):
         """打开音频输出流"""
         if not PYAUDIO_AVAILABLE or not self.pyaudio_instance:
-            self.logger.info("模拟打开音频输出流")
+            logger.info("模拟打开音频输出流")
             return None
         
+        native_rate = self.get_default_output_rate()
+        if native_rate and native_rate != self.output_config.sample_rate:
+            logger.info(
+                "输出设备原生采样率为 %d Hz，TTS音频为 %d Hz，将由音频后端重采样；"
+                "可在会话配置 tts.audio_config.sample_rate 中请求设备采样率以避免重采样",
+                native_rate, self.output_config.sample_rate
+            )
+        
         try:
             self.output_stream = self.pyaudio_instance.open(
                 format=self.output_config.bit_size,
                 channels=self.output_config.channels,
                 rate=self.output_config.sample_rate,
                 output=True,
-                frames_per_buffer=self.output_config.chunk
+                frames_per_buffer=self.output_config.frames_per_buffer
             )
-            self.logger.info("音频输出流已打开")
+            logger.info("音频输出流已打开")
             return self.output_stream
         except Exception as e:
-            self.logger.error(f"打开音频输出流失败: {e}")
+            logger.error("打开音频输出流失败: %s", e)
             return None
     
     def cleanup(self):
@@ -117,21 +164,28 @@ class AudioDeviceManager:
                 self.pyaudio_instance.terminate()
                 self.pyaudio_instance = None
             
-            self.logger.info("音频设备资源已清理")
+            logger.info("音频设备资源已清理")
         except Exception as e:
-            self.logger.error(f"清理音频设备失败: {e}")
+            logger.error("清理音频设备失败: %s", e)
 
 
 class IntegratedVoiceSession:
-    """集成语音会话管理器"""
+    """集成语音会话管理器
+    
+    on_audio_received 在事件循环线程中调用。gzip压缩的纯音频帧会流式解压，
+    每帧可能分多次回调，每次最多 STREAM_CHUNK_SIZE 字节；其他音频每帧回调一次。
+    """
+    
+    # 音频数据的base64解码函数
+    _b64decode = staticmethod(binascii.a2b_base64)
     
     def __init__(self, 
                  voice_config: Dict[str, Any],
                  session_config: Dict[str, Any],
                  on_text_received: Callable[[str], None] = None,
-                 on_audio_received: Callable[[bytes], None] = None):
-        
-        self.logger = logging.getLogger(__name__)
+                 on_audio_received: Callable[[bytes], None] = None,
+                 input_audio_config: Optional[AudioConfig] = None,
+                 output_audio_config: Optional[AudioConfig] = None):
         self.voice_config = voice_config
         self.session_config = session_config
         
@@ -145,28 +199,37 @@ class IntegratedVoiceSession:
             session_id=None
         )
         self.voice_client.on_message_received = self._handle_voice_message
+        self.voice_client.on_audio_chunk = self._on_audio_chunk
         
-        # 音频设备配置
-        input_config = AudioConfig(
+        # 音频设备配置，未指定时使用默认配置
+        input_config = input_audio_config or AudioConfig(
             format="pcm",
-            bit_size=pyaudio.paInt16 if PYAUDIO_AVAILABLE else 16,
+            bit_size=INPUT_BIT_SIZE,
             channels=1,
             sample_rate=16000,
             chunk=1600
         )
         
-        output_config = AudioConfig(
+        output_config = output_audio_config or AudioConfig(
             format="pcm", 
-            bit_size=pyaudio.paFloat32 if PYAUDIO_AVAILABLE else 32,
+            bit_size=OUTPUT_BIT_SIZE,
             channels=1,
-            sample_rate=24000,
+            sample_rate=self._get_tts_sample_rate(session_config),
             chunk=3200
         )
         
         self.audio_device = AudioDeviceManager(input_config, output_config)
         
         # 音频队列和线程
+        # 网络帧和流式解压块大小不固定，按字节数限制容量：float32输出约PLAYBACK_QUEUE_SECONDS秒音频
         self.audio_queue = queue.Queue()
+        self._playback_limit = (
+            output_config.sample_rate * output_config.channels * 4 * PLAYBACK_QUEUE_SECONDS
+        )
+        self._queued_bytes = 0
+        # 保护_queued_bytes和_playback_drops，播放线程出队时也会更新计数
+        self._queue_lock = threading.Lock()
+        self._playback_drops = 0
         self.output_stream = None
         self.player_thread: Optional[threading.Thread] = None
         self.recorder_thread: Optional[threading.Thread] = None
@@ -178,133 +241,165 @@ class IntegratedVoiceSession:
         
         # 保存主事件循环引用
         self.main_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # 会话重建：同一时间只运行一个重建任务，期间的重建请求合并处理
+        self._needs_restart: Optional[asyncio.Event] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        
+        # 消息接收任务，保存引用避免被垃圾回收
+        self.receive_task: Optional[asyncio.Task] = None
+    
+    @staticmethod
+    def _get_tts_sample_rate(session_config: Dict[str, Any]) -> int:
+        """读取会话配置中请求的TTS采样率，使输出流与服务端下发的音频一致"""
+        audio_config = session_config.get("tts", {}).get("audio_config", {})
+        return int(audio_config.get("sample_rate", DEFAULT_TTS_SAMPLE_RATE))
     
     async def start(self) -> bool:
         """启动语音会话"""
         try:
-            self.logger.info("启动集成语音会话")
+            logger.info("启动集成语音会话")
             
             # 保存当前事件循环引用
             self.main_loop = asyncio.get_running_loop()
+            self._needs_restart = asyncio.Event()
             
-            # 连接语音服务
-            if not await self.voice_client.connect():
+            # 连接语音服务并启动语音会话
+            if not await self.voice_client.connect_and_start(self.session_config):
                 return False
             
-            # 启动语音会话
-            if await self.voice_client.start_session(self.session_config):
-                self.logger.info("语音会话启动成功")
-                
-                # 启动消息接收任务
-                self.receive_task = asyncio.create_task(self.voice_client.receive_messages())
-                
-                # 启动音频设备
-                self.output_stream = self.audio_device.open_output_stream()
-                self.logger.info("音频输出流已打开")
-                
-                # 启动音频处理线程
-                self.is_running = True
-                self.is_playing = True
-                
-                # 启动播放线程
-                self.player_thread = threading.Thread(target=self._audio_player_loop)
-                self.player_thread.daemon = True
-                self.player_thread.start()
-                
-                # 只有在真实音频设备可用时才启动录音线程
-                if PYAUDIO_AVAILABLE:
-                    self.is_recording = True
-                    self.recorder_thread = threading.Thread(target=self._audio_recorder_loop)
-                    self.recorder_thread.daemon = True
-                    self.recorder_thread.start()
-                else:
-                    self.logger.info("PyAudio不可用，跳过音频录制")
+            logger.info("语音会话启动成功")
+            
+            # 启动消息接收任务
+            self.receive_task = asyncio.create_task(
+                self.voice_client.receive_messages(), name="voice-recv"
+            )
             
-            self.logger.info("集成语音会话启动成功")
+            # 启动音频设备
+            self.output_stream = self.audio_device.open_output_stream()
+            logger.info("音频输出流已打开")
+            
+            # 启动音频处理线程
+            self.is_running = True
+            self.is_playing = True
+            
+            # 启动播放线程
+            self.player_thread = threading.Thread(target=self._audio_player_loop)
+            self.player_thread.daemon = True
+            self.player_thread.start()
+            
+            # 只有在真实音频设备可用时才启动录音线程
+            if PYAUDIO_AVAILABLE:
+                self.is_recording = True
+                self.recorder_thread = threading.Thread(target=self._audio_recorder_loop)
+                self.recorder_thread.daemon = True
+                self.recorder_thread.start()
+            else:
+                logger.info("PyAudio不可用，跳过音频录制")
+            
+            logger.info("集成语音会话启动成功")
             return True
             
         except Exception as e:
-            self.logger.error(f"启动语音会话失败: {e}")
+            logger.error("启动语音会话失败: %s", e)
             return False
     
     async def stop(self):
         """停止语音会话，此方法为非阻塞设计，会立即返回"""
         try:
-            self.logger.info("开始执行非阻塞式停止语音会话流程...")
+            logger.info("开始执行非阻塞式停止语音会话流程...")
             
             # 1. 立即设置状态标志，通知所有内部循环线程停止
             self.is_running = False
             self.is_recording = False
             self.is_playing = False
             
+            # 取消后台重建和消息接收任务
+            await self._cancel_background_tasks()
+            
             # 2. 优先、异步地关闭网络连接
             try:
-                if self.voice_client and self.voice_client.is_connected:
-                    self.logger.info("正在异步断开WebSocket连接...")
-                    # 创建一个任务来执行断开，不直接等待
-                    asyncio.create_task(self.voice_client.disconnect())
-                    self.logger.info("WebSocket断开任务已提交")
+                # 连接被远端关闭时 is_connected 已为 False，仍需调用 disconnect() 释放写任务和连接
+                if self.voice_client:
+                    logger.info("正在异步断开WebSocket连接...")
+                    # disconnect() 会立即返回，耗时的网络清理在客户端的后台任务中执行
+                    await self.voice_client.disconnect()
+                    logger.info("WebSocket断开任务已提交")
             except Exception as e:
-                self.logger.error(f"提交WebSocket断开任务时出错: {e}", exc_info=True)
+                logger.error("提交WebSocket断开任务时出错: %s", e, exc_info=True)
                 
             # 3. 将所有阻塞的清理操作提交到后台线程执行，且不等待其完成
             def _blocking_cleanup_task():
                 """包含所有阻塞操作的清理函数"""
-                self.logger.info("后台清理线程：开始执行...")
+                logger.info("后台清理线程：开始执行...")
                 try:
                     # 清理PyAudio设备资源，这是一个阻塞操作
                     self.audio_device.cleanup()
-                    self.logger.info("后台清理线程：音频设备已成功清理。")
+                    logger.info("后台清理线程：音频设备已成功清理。")
                 except Exception as e:
-                    self.logger.error(f"后台清理线程：清理音频设备时出错: {e}", exc_info=True)
-                self.logger.info("后台清理线程：任务执行完毕。")
+                    logger.error("后台清理线程：清理音频设备时出错: %s", e, exc_info=True)
+                logger.info("后台清理线程：任务执行完毕。")
 
             try:
                 loop = asyncio.get_running_loop()
                 loop.run_in_executor(None, _blocking_cleanup_task)
-                self.logger.info("阻塞的设备清理任务已成功提交到后台线程。")
+                logger.info("阻塞的设备清理任务已成功提交到后台线程。")
             except RuntimeError:
-                self.logger.warning("无法获取事件循环，将在当前线程同步执行清理任务...")
+                logger.warning("无法获取事件循环，将在当前线程同步执行清理任务...")
                 _blocking_cleanup_task()
 
-            self.logger.info("非阻塞式停止流程已完成，函数将立即返回。")
+            logger.info("非阻塞式停止流程已完成，函数将立即返回。")
             return True
             
         except Exception as e:
-            self.logger.error(f"执行停止语音会话流程时发生严重错误: {e}", exc_info=True)
+            logger.error("执行停止语音会话流程时发生严重错误: %s", e, exc_info=True)
             return False
     
+    async def _cancel_background_tasks(self):
+        """取消并等待重建任务和消息接收任务结束"""
+        current = asyncio.current_task()
+        for task in (self._reconnect_task, self.receive_task):
+            if task is None or task is current or task.done():
+                continue
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._reconnect_task = None
+        self.receive_task = None
+    
     async def send_text_for_speech(self, text: str):
         """发送文本进行语音合成"""
         try:
             await self.voice_client.send_text(text)
         except Exception as e:
-            self.logger.error(f"发送文本失败: {e}")
+            logger.error("发送文本失败: %s", e)
     
     def _audio_player_loop(self):
         """音频播放线程循环"""
-        self.logger.info("启动音频播放线程")
+        logger.info("启动音频播放线程")
         
         while self.is_playing:
             try:
                 # 从队列获取音频数据
                 audio_data = self.audio_queue.get(timeout=1.0)
+                with self._queue_lock:
+                    self._queued_bytes -= len(audio_data)
                 
                 if audio_data and self.output_stream:
                     if PYAUDIO_AVAILABLE:
                         self.output_stream.write(audio_data)
                     else:
                         # 模拟播放
-                        self.logger.debug(f"模拟播放音频: {len(audio_data)} bytes")
+                        logger.debug("模拟播放音频: %d bytes", len(audio_data))
                         
             except queue.Empty:
                 # 队列为空时短暂休眠
                 time.sleep(0.1)
             except Exception as e:
-                self.logger.error(f"音频播放错误: {e}")
+                logger.error("音频播放错误: %s", e)
                 time.sleep(0.1)
         
-        self.logger.info("音频播放线程已停止")
+        logger.info("音频播放线程已停止")
     
     def _audio_recorder_loop(self):
         """音频录制线程"""
@@ -316,46 +411,82 @@ class IntegratedVoiceSession:
             
             # 打开音频输入流
             input_stream = self.audio_device.open_input_stream()
-            self.logger.info("音频输入流已打开")
+            logger.info("音频输入流已打开")
+            
+            input_config = self.audio_device.input_config
+            chunk = input_config.chunk
+            chunk_bytes = chunk * input_config.channels * pyaudio.get_sample_size(input_config.bit_size)
             
             while self.is_recording and self.is_running:
                 try:
                     if PYAUDIO_AVAILABLE and input_stream:
                         # 检查会话状态 - 使用更可靠的状态检查
-                        if not self.voice_client or not self.voice_client.is_connected:
-                            self.logger.debug("语音服务未连接，跳过音频发送")
-                            time.sleep(0.2)
+                        # 未连接时阻塞等待连接事件，而不是轮询连接状态
+                        if not self.voice_client.connected_event.wait(timeout=1.0):
+                            logger.debug("语音服务未连接，跳过音频发送")
                             continue
                     
-                    # 读取音频数据
-                    audio_data = input_stream.read(
-                        self.audio_device.input_config.chunk,
-                        exception_on_overflow=False
-                    )
+                    # 主事件循环不可用时无法再投递发送任务，直接退出录音线程
+                    main_loop = self.main_loop
+                    if main_loop is None or main_loop.is_closed():
+                        logger.warning("主事件循环不可用，停止音频录制")
+                        break
                     
-                    # 发送到语音服务 - 使用保存的事件循环引用
-                    if self.main_loop and not self.main_loop.is_closed():
-                        future = asyncio.run_coroutine_threadsafe(
-                            self.voice_client.send_audio(audio_data),
-                            self.main_loop
-                        )
-                        # 不等待结果，避免阻塞
-                        try:
-                            future.result(timeout=0.1)  # 短暂超时
-                        except concurrent.futures.TimeoutError:
-                            # 超时是正常的，继续录音
-                            pass
-                        except Exception as e:
-                            self.logger.warning(f"发送音频数据失败: {e}")
-                    else:
-                        self.logger.warning("主事件循环不可用，跳过音频发送")
+                    # 缓冲区不足一个chunk时等待，避免短读
+                    available = input_stream.get_read_available()
+                    if available < chunk:
+                        time.sleep(max(0.001, (chunk - available) / input_config.sample_rate * 0.5))
+                        continue
+                    
+                    # 一次读出所有完整chunk，再按chunk切分发送
+                    audio_data = memoryview(input_stream.read(
+                        available // chunk * chunk,
+                        exception_on_overflow=False
+                    ))
+                    for offset in range(0, len(audio_data), chunk_bytes):
+                        self._send_audio_chunk(audio_data[offset:offset + chunk_bytes], main_loop)
                 except Exception as e:
-                    self.logger.error(f"音频录制错误: {e}")
+                    logger.error("音频录制错误: %s", e)
                     time.sleep(0.1)
         except Exception as e:
-            self.logger.error(f"音频录制错误: {e}")
+            logger.error("音频录制错误: %s", e)
         
-        self.logger.info("音频录制线程已停止")
+        logger.info("音频录制线程已停止")
+    
+    def _enqueue_audio(self, audio_data: bytes):
+        """加入播放队列，缓存音频超过容量时丢弃最旧的音频（至少保留刚加入的一块）"""
+        with self._queue_lock:
+            self.audio_queue.put_nowait(audio_data)
+            self._queued_bytes += len(audio_data)
+            while self._queued_bytes > self._playback_limit and self.audio_queue.qsize() > 1:
+                try:
+                    dropped = self.audio_queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._queued_bytes -= len(dropped)
+                self._playback_drops += 1
+    
+    def _on_audio_chunk(self, audio_data: bytes):
+        """流式解压出的音频块直接进入播放队列（由语音客户端在事件循环线程中调用）"""
+        self._enqueue_audio(audio_data)
+        if self.on_audio_received_callback:
+            self.on_audio_received_callback(audio_data)
+    
+    def _send_audio_chunk(self, audio_data: AudioBuffer, main_loop: asyncio.AbstractEventLoop):
+        """从录音线程向语音服务发送一个音频块"""
+        # 发送到语音服务 - 使用保存的事件循环引用
+        future = asyncio.run_coroutine_threadsafe(
+            self.voice_client.send_audio(audio_data),
+            main_loop
+        )
+        # 不等待结果，避免阻塞
+        try:
+            future.result(timeout=0.1)  # 短暂超时
+        except concurrent.futures.TimeoutError:
+            # 超时是正常的，继续录音
+            pass
+        except Exception as e:
+            logger.warning("发送音频数据失败: %s", e)
     
     async def _handle_voice_message(self, message: VoiceMessage):
         """处理语音服务消息"""
@@ -374,53 +505,58 @@ class IntegratedVoiceSession:
                         if audio_data and self.on_audio_received_callback:
                             # 音频数据可能是base64编码的字符串
                             if isinstance(audio_data, str):
-                                import base64
                                 try:
-                                    audio_data = base64.b64decode(audio_data)
+                                    audio_data = self._b64decode(audio_data)
                                 except Exception as e:
-                                    self.logger.error(f"解码音频数据失败: {e}")
+                                    logger.error("解码音频数据失败: %s", e)
                                     return
                             
                             self.on_audio_received_callback(audio_data)
                             # 添加到播放队列
-                            self.audio_queue.put(audio_data)
+                            self._enqueue_audio(audio_data)
                     
                     # 处理纯音频响应（ACK类型）
                     elif isinstance(message.payload_msg, bytes):
                         # 直接是音频数据
-                        self.audio_queue.put(message.payload_msg)
+                        self._enqueue_audio(message.payload_msg)
                         if self.on_audio_received_callback:
                             self.on_audio_received_callback(message.payload_msg)
                             
             elif message.message_type == 'SERVER_ACK':
                 # SERVER_ACK 通常包含音频数据
                 if isinstance(message.payload_msg, bytes):
-                    self.audio_queue.put(message.payload_msg)
+                    self._enqueue_audio(message.payload_msg)
                     if self.on_audio_received_callback:
                         self.on_audio_received_callback(message.payload_msg)
                         
             elif message.message_type == 'SERVER_ERROR':
-                self.logger.error(f"服务器错误: {message.payload_msg}")
+                logger.error("服务器错误: %s", message.payload_msg)
                 
                 # 检查是否是会话重建错误
                 if (isinstance(message.payload_msg, dict) and 
                     'error' in message.payload_msg and
                     'recreate session' in str(message.payload_msg['error'])):
-                    self.logger.warning("服务器要求重建会话，尝试重新连接...")
+                    logger.warning("服务器要求重建会话，尝试重新连接...")
                     
                     # 标记会话需要重启
                     self.voice_client.is_session_started = False
                     
-                    # 尝试重新建立会话
-                    if self.main_loop and not self.main_loop.is_closed():
-                        # 在主事件循环中执行重连
-                        asyncio.run_coroutine_threadsafe(
-                            self._recreate_session(),
-                            self.main_loop
-                        )
+                    # 尝试重新建立会话，已有重建任务时仅标记需要再次重建
+                    if self._needs_restart is not None:
+                        self._needs_restart.set()
+                        if self._reconnect_task is None or self._reconnect_task.done():
+                            self._reconnect_task = asyncio.create_task(
+                                self._reconnect_worker(), name="voice-reconnect"
+                            )
                 
         except Exception as e:
-            self.logger.error(f"处理语音消息失败: {e}", exc_info=True)
+            logger.error("处理语音消息失败: %s", e, exc_info=True)
+    
+    async def _reconnect_worker(self):
+        """单实例重建任务，合并重建期间收到的重建请求"""
+        while self._needs_restart.is_set():
+            self._needs_restart.clear()
+            await self._recreate_session()
     
     async def _recreate_session(self):
         """重新创建会话"""
@@ -429,7 +565,7 @@ class IntegratedVoiceSession:
         
         for attempt in range(max_retries):
             try:
-                self.logger.info(f"开始重建语音会话... (尝试 {attempt + 1}/{max_retries})")
+                logger.info("开始重建语音会话... (尝试 %d/%d)", attempt + 1, max_retries)
                 
                 # 1. 停止录音，避免继续发送音频
                 self.is_recording = False
@@ -446,37 +582,36 @@ class IntegratedVoiceSession:
                     session_id=None  # 使用新的会话ID
                 )
                 self.voice_client.on_message_received = self._handle_voice_message
+                self.voice_client.on_audio_chunk = self._on_audio_chunk
                 
-                # 5. 重新连接
-                if await self.voice_client.connect():
-                    # 6. 重新启动会话
-                    if await self.voice_client.start_session(self.session_config):
-                        self.logger.info("会话重建成功")
-                        
-                        # 7. 重新启动消息接收
-                        asyncio.create_task(self.voice_client.receive_messages())
-                        
-                        # 8. 恢复录音
-                        if PYAUDIO_AVAILABLE:
-                            self.is_recording = True
-                        
-                        return True
-                    else:
-                        self.logger.error(f"会话重建失败：无法启动新会话 (尝试 {attempt + 1}/{max_retries})")
+                # 5. 重新连接并启动会话
+                if await self.voice_client.connect_and_start(self.session_config):
+                    logger.info("会话重建成功")
+                    
+                    # 6. 重新启动消息接收
+                    self.receive_task = asyncio.create_task(
+                        self.voice_client.receive_messages(), name="voice-recv"
+                    )
+                    
+                    # 7. 恢复录音
+                    if PYAUDIO_AVAILABLE:
+                        self.is_recording = True
+                    
+                    return True
                 else:
-                    self.logger.error(f"会话重建失败：无法连接到服务器 (尝试 {attempt + 1}/{max_retries})")
+                    logger.error("会话重建失败：无法连接到服务器或启动新会话 (尝试 %d/%d)", attempt + 1, max_retries)
                 
                 # 增加重试延迟
                 retry_delay *= 2
                 
             except Exception as e:
-                self.logger.error(f"重建会话时发生错误 (尝试 {attempt + 1}/{max_retries}): {e}")
+                logger.error("重建会话时发生错误 (尝试 %d/%d): %s", attempt + 1, max_retries, e)
                 
                 if attempt < max_retries - 1:
                     await asyncio.sleep(retry_delay)
                     retry_delay *= 2
         
-        self.logger.error(f"会话重建失败：已尝试{max_retries}次")
+        logger.error("会话重建失败：已尝试%d次", max_retries)
         return False
     
     def get_status(self) -> Dict[str, Any]:
@@ -485,6 +620,7 @@ class IntegratedVoiceSession:
             "is_running": self.is_running,
             "is_recording": self.is_recording,
             "is_playing": self.is_playing,
+            "playback_drops": self._playback_drops,
             "voice_client_status": self.voice_client.get_status(),
             "audio_available": PYAUDIO_AVAILABLE
         } 
\ No newline at end of file
@@ -3,69 +3,139 @@
 """
 
 import asyncio
-import uuid
+import atexit
+import contextlib
+import functools
+import os
+import socket
+import struct
 import logging
 from typing import Dict, Any, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
 import websockets
 import websockets.exceptions
 import json
+import re
 import threading
 import traceback
 from websockets.exceptions import ConnectionClosed
 
-from .voice_protocol import VoiceProtocolHandler, VoiceMessage
+from .voice_protocol import (
+    VoiceProtocolHandler, VoiceMessage, AudioBuffer, AudioFramer, DECOMPRESS_ERRORS
+)
+
+# 按websockets版本确定获取logid和判断连接状态的方式，避免运行时反复探测属性
+_WS_VERSION = tuple(int(x) for x in re.findall(r"\d+", websockets.__version__)[:2])
+
+if _WS_VERSION >= (14, 0):
+    from websockets.protocol import State
+
+    def _get_logid(ws) -> str:
+        return ws.response.headers.get("X-Tt-Logid", "") or ""
+
+    def _is_open(ws) -> bool:
+        return ws.state is State.OPEN
+else:
+    def _get_logid(ws) -> str:
+        return ws.response_headers.get("X-Tt-Logid", "") or ""
+
+    def _is_open(ws) -> bool:
+        return ws.open
+
+# 单条WebSocket消息上限（字节），TTS音频帧可达MB级，超出时连接会以1009关闭；可通过配置 max_size 调整
+WS_MAX_SIZE = 4 * 1024 * 1024
+
+# 底层TCP发送缓冲区大小（字节）
+TCP_SEND_BUFFER = 64 * 1024
+
+# 发送队列容量，队列满时发送方等待（背压）
+SEND_QUEUE_SIZE = 64
+
+# 接收错误后的退避等待时间（秒）
+RECV_RETRY_DELAY = 0.01
+RECV_RETRY_MAX_DELAY = 1.0
+
+# 单帧解析失败（帧过短、解压/反序列化出错、收到文本帧）只影响当前帧，无需退避
+FRAME_DECODE_ERRORS = (ValueError, IndexError, TypeError, struct.error) + DECOMPRESS_ERRORS
+
+# 单次等待消息的超时时间（秒），超时后重新检查连接状态
+RECV_TIMEOUT = 5.0
+
+# 超过该大小（字节）的响应帧放到线程池中解析，避免阻塞事件循环
+PARSE_OFFLOAD_THRESHOLD = 32 * 1024
+
+# 大帧解析专用线程池，所有客户端共享，不占用事件循环的默认线程池
+_PARSE_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="voice-parse")
+atexit.register(_PARSE_POOL.shutdown)
+
+# 会话结束事件
+SESSION_END_EVENTS = frozenset((152, 153))
+
+# 断开连接前发送的 Stop 帧（文本帧）
+STOP_FRAME = json.dumps({"type": "Stop"})
+
+# 发送队列中的请求类型
+_SEND_AUDIO = "audio"
+_SEND_TEXT = "text"
+
+
+def _new_session_id() -> str:
+    """生成随机会话ID，保持UUID的8-4-4-4-12文本格式"""
+    h = os.urandom(16).hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
 
 
 class VoiceServiceClient:
     """语音服务客户端"""
     
+    # 所有实例共用同一个logger
+    logger = logging.getLogger(__name__)
+    
     def __init__(self, 
                  config: Dict[str, Any],
                  session_id: Optional[str] = None):
         self.config = config
-        self.session_id = session_id or str(uuid.uuid4())
+        self.session_id = session_id or _new_session_id()
         self.ws: Optional[websockets.WebSocketServerProtocol] = None
         self.logid = ""
-        self.logger = logging.getLogger(__name__)
         
         # 回调函数
         self.on_message_received: Optional[Callable] = None
+        # 设置后gzip压缩的纯音频负载逐块解压交给该回调（每块最多STREAM_CHUNK_SIZE字节，始终在事件循环线程调用）
+        self.on_audio_chunk: Optional[Callable[[bytes], Any]] = None
         self.on_connection_lost: Optional[Callable] = None
         
         # 连接状态
         self.is_connected = False
         self.is_session_started = False
-        self._stop_sending_event = threading.Event()
-        self._send_thread = None
+        # 连接建立时置位、断开时清除，供音频线程阻塞等待重连
+        self.connected_event = threading.Event()
+        
+        # 发送队列和写任务，由单一写任务合并发送
+        self._send_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        
+        # 后台清理任务，保存引用避免被垃圾回收，也避免重复清理
+        self._cleanup_task: Optional[asyncio.Task] = None
+        
+        # 音频请求帧构建器，按会话复用帧缓冲区
+        self._audio_framer = AudioFramer(self.session_id)
     
     async def connect(self) -> bool:
         """建立WebSocket连接"""
         try:
-            self.logger.info(f"连接到语音服务: {self.config['base_url']}")
-            
-            # websockets 13.x 使用 extra_headers 参数
-            self.ws = await websockets.connect(
-                self.config['base_url'],
-                extra_headers=self.config['headers'],
-                ping_interval=None
-            )
-            
-            # websockets 13.x 中响应头的获取方式
-            if hasattr(self.ws, 'response_headers'):
-                self.logid = self.ws.response_headers.get("X-Tt-Logid", "") or ""
-            else:
-                self.logid = ""
-            self.logger.info(f"连接成功，logid: {self.logid}")
+            await self._open_websocket()
             
             # 发送连接请求
             await self._send_connection_request()
             
-            self.is_connected = True
+            self._mark_connected()
             return True
             
         except Exception as e:
             self.logger.error(f"连接失败: {e}")
             self.is_connected = False
+            self.connected_event.clear()
             return False
     
     async def start_session(self, session_config: Dict[str, Any]) -> bool:
@@ -82,7 +152,85 @@ class VoiceServiceClient:
             )
             await self.ws.send(request)
             
-            # 接收响应
+        except Exception as e:
+            self.logger.error(f"启动会话失败: {e}")
+            return False
+        
+        return await self._receive_session_response()
+    
+    async def connect_and_start(self, session_config: Dict[str, Any]) -> bool:
+        """建立连接并启动会话
+        
+        连接请求和会话启动请求连续发出后再依次接收响应，
+        相比分别调用 connect() 和 start_session() 少一次往返。
+        """
+        try:
+            await self._open_websocket()
+            
+            self.logger.info("发送连接请求并启动语音会话")
+            await self.ws.send(VoiceProtocolHandler.create_connection_request())
+            await self.ws.send(
+                VoiceProtocolHandler.create_session_request(self.session_id, session_config)
+            )
+            
+            # 先接收连接请求的响应（websockets 不允许并发 recv）
+            response = await self.ws.recv()
+            message = VoiceProtocolHandler.parse_response(response)
+            if message.message_type != 'SERVER_FULL_RESPONSE':
+                raise Exception(f"连接请求失败: {message.payload_msg}")
+            self.logger.info("连接请求成功")
+            
+            self._mark_connected()
+            
+        except Exception as e:
+            self.logger.error(f"连接失败: {e}")
+            self.is_connected = False
+            self.connected_event.clear()
+            return False
+        
+        return await self._receive_session_response()
+    
+    async def _open_websocket(self):
+        """打开WebSocket连接并记录logid"""
+        self.logger.info(f"连接到语音服务: {self.config['base_url']}")
+        
+        # websockets 13.x 使用 extra_headers 参数
+        # 协议负载已经过gzip压缩，默认关闭permessage-deflate，可通过配置 compression="deflate" 开启
+        self.ws = await websockets.connect(
+            self.config['base_url'],
+            extra_headers=self.config['headers'],
+            ping_interval=None,
+            compression=self.config.get('compression'),
+            max_size=self.config.get('max_size', WS_MAX_SIZE)
+        )
+        
+        self.logid = _get_logid(self.ws)
+        self._tune_socket()
+        self.logger.info(f"连接成功，logid: {self.logid}")
+    
+    def _tune_socket(self):
+        """关闭Nagle算法并限制发送缓冲区，降低小音频帧的发送延迟"""
+        sock = self.ws.transport.get_extra_info('socket')
+        if sock is None:
+            return
+        
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, TCP_SEND_BUFFER)
+        except OSError as e:
+            self.logger.warning("设置socket选项失败: %s", e)
+    
+    def _mark_connected(self):
+        """连接请求成功后启动写任务并更新连接状态"""
+        self._send_queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self._writer_task = asyncio.create_task(self._writer_loop(), name="voice-writer")
+        
+        self.is_connected = True
+        self.connected_event.set()
+    
+    async def _receive_session_response(self) -> bool:
+        """接收并检查会话启动响应"""
+        try:
             response = await self.ws.recv()
             message = VoiceProtocolHandler.parse_response(response)
             
@@ -98,67 +246,173 @@ class VoiceServiceClient:
             self.logger.error(f"启动会话失败: {e}")
             return False
     
-    async def send_audio(self, audio_data: bytes):
-        """发送音频数据"""
+    async def send_audio(self, audio_data: AudioBuffer):
+        """发送音频数据（加入发送队列）
+        
+        数据在实际发出前不会被复制，调用方在此之后不应再修改该缓冲区。
+        """
         try:
             if not self.is_connected or not self.is_session_started:
                 raise Exception("会话未启动")
             
-            request = VoiceProtocolHandler.create_audio_request(
-                self.session_id, audio_data
-            )
-            await self.ws.send(request)
+            await self._send_queue.put((_SEND_AUDIO, audio_data))
             
         except Exception as e:
-            self.logger.error(f"发送音频失败: {e}")
+            self.logger.error("发送音频失败: %s", e)
             raise
     
     async def send_text(self, text: str):
-        """发送文本（用于TTS）"""
+        """发送文本（用于TTS，加入发送队列）"""
         try:
             if not self.is_connected or not self.is_session_started:
                 raise Exception("会话未启动")
             
-            # 使用专门的TTS请求方法
-            request = VoiceProtocolHandler.create_tts_request(
-                self.session_id, text
-            )
-            await self.ws.send(request)
-            
-            self.logger.info(f"已发送TTS请求: {text[:50]}...")
+            await self._send_queue.put((_SEND_TEXT, text))
             
         except Exception as e:
-            self.logger.error(f"发送文本失败: {e}")
+            self.logger.error("发送文本失败: %s", e)
             raise
     
+    async def flush(self):
+        """等待发送队列中的请求全部发出；写任务在此期间停止（断开连接）时立即返回"""
+        writer_task = self._writer_task
+        if self._send_queue is None or not writer_task or writer_task.done():
+            return
+        join_task = asyncio.ensure_future(self._send_queue.join())
+        try:
+            await asyncio.wait((join_task, writer_task), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            join_task.cancel()
+    
+    async def _stop_writer(self):
+        """停止写任务并丢弃未发送的请求（断开连接或连接被远端关闭时调用）"""
+        writer_task, self._writer_task = self._writer_task, None
+        if writer_task:
+            writer_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await writer_task
+            self._drain_send_queue()
+            self.logger.info("发送任务已停止。")
+    
+    def _drain_send_queue(self):
+        """丢弃未发送的请求并逐个标记完成，避免等待 join() 的 flush() 永久挂起"""
+        send_queue = self._send_queue
+        if send_queue is None:
+            return
+        while not send_queue.empty():
+            send_queue.get_nowait()
+            send_queue.task_done()
+    
+    async def _writer_loop(self):
+        """写任务：取出队列中已积压的全部请求，合并连续音频后依次发送"""
+        send_queue = self._send_queue
+        while True:
+            items = [await send_queue.get()]
+            while not send_queue.empty():
+                items.append(send_queue.get_nowait())
+            
+            try:
+                for request in self._build_requests(items):
+                    await self.ws.send(request)
+            except Exception as e:
+                self.logger.error("发送请求失败: %s", e)
+            finally:
+                for _ in items:
+                    send_queue.task_done()
+    
+    @staticmethod
+    def _join_audio(audio_chunks) -> AudioBuffer:
+        """合并音频块，只有一块时直接使用原缓冲区"""
+        if len(audio_chunks) == 1:
+            return audio_chunks[0]
+        return b"".join(audio_chunks)
+    
+    def _build_requests(self, items):
+        """将队列请求转换为协议帧，相邻的音频块合并为一帧
+        
+        音频帧共用同一缓冲区，必须在发送完上一帧后再取下一帧。
+        """
+        audio_chunks = []
+        for kind, data in items:
+            if kind == _SEND_AUDIO:
+                audio_chunks.append(data)
+                continue
+            
+            if audio_chunks:
+                yield self._audio_framer.frame(self._join_audio(audio_chunks))
+                audio_chunks = []
+            
+            # 使用专门的TTS请求方法
+            yield VoiceProtocolHandler.create_tts_request(self.session_id, data)
+            self.logger.info("已发送TTS请求: %.50s...", data)
+        
+        if audio_chunks:
+            yield self._audio_framer.frame(self._join_audio(audio_chunks))
+    
     async def receive_messages(self):
         """接收消息循环"""
+        retry_delay = RECV_RETRY_DELAY
+        loop = asyncio.get_running_loop()
+        # 循环内不变的属性提前取出
+        ws = self.ws
+        on_message = self.on_message_received
+        parse_response = offload_parse = VoiceProtocolHandler.parse_response
+        on_audio_chunk = self.on_audio_chunk
+        if on_audio_chunk:
+            parse_response = functools.partial(
+                VoiceProtocolHandler.parse_response_streaming, on_chunk=on_audio_chunk
+            )
+            # 解析线程中解出的音频块交回事件循环按顺序执行，先于该帧的消息回调
+            offload_parse = functools.partial(
+                VoiceProtocolHandler.parse_response_streaming,
+                on_chunk=functools.partial(loop.call_soon_threadsafe, on_audio_chunk)
+            )
         try:
-            while self.is_connected and self.ws:
+            while self.is_connected and ws:
                 try:
-                    response = await self.ws.recv()
-                    message = VoiceProtocolHandler.parse_response(response)
+                    # 取消 recv() 不会丢失消息，超时后回到循环检查连接状态
+                    try:
+                        response = await asyncio.wait_for(ws.recv(), timeout=RECV_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        continue
+                    retry_delay = RECV_RETRY_DELAY
+                    # 只有解析本身的异常按单帧错误处理，回调中的异常交给下面的通用分支
+                    try:
+                        if len(response) > PARSE_OFFLOAD_THRESHOLD:
+                            message = await loop.run_in_executor(
+                                _PARSE_POOL, offload_parse, response
+                            )
+                        else:
+                            message = parse_response(response)
+                    except FRAME_DECODE_ERRORS as e:
+                        self.logger.error("解析消息错误: %s", e)
+                        # 丢弃当前帧，让出事件循环后立即接收下一帧
+                        await asyncio.sleep(0)
+                        continue
                     
                     # 调用回调函数
-                    if self.on_message_received:
-                        await self.on_message_received(message)
+                    if on_message:
+                        await on_message(message)
                         
                     # 检查是否是会话结束事件
-                    if (message.event and 
-                        message.event in [152, 153]):  # 会话结束事件
-                        self.logger.info(f"收到会话结束事件: {message.event}")
+                    event = message.event
+                    if event is not None and event in SESSION_END_EVENTS:
+                        self.logger.info("收到会话结束事件: %s", event)
                         self.is_session_started = False
                         break
                         
                 except websockets.exceptions.ConnectionClosed:
                     self.logger.info("WebSocket连接已关闭")
                     self.is_connected = False
+                    self.connected_event.clear()
                     self.is_session_started = False
+                    await self._stop_writer()
                     break
                 except Exception as e:
-                    self.logger.error(f"接收消息错误: {e}")
-                    # 不要立即断开，可能是临时错误
-                    await asyncio.sleep(0.1)
+                    self.logger.error("接收消息错误: %s", e)
+                    # 不要立即断开，可能是临时错误；连续出错时指数退避
+                    await asyncio.sleep(retry_delay)
+                    retry_delay = min(retry_delay * 2, RECV_RETRY_MAX_DELAY)
                     
         except Exception as e:
             self.logger.error(f"消息接收循环错误: {e}")
@@ -186,18 +440,14 @@ class VoiceServiceClient:
         """Helper to perform the actual network cleanup in the background."""
         self.logger.info("开始后台清理 WebSocket 连接...")
 
-        # Stop sending audio thread
-        if self._send_thread and self._send_thread.is_alive():
-            self._stop_sending_event.set()
-            # We don't join the thread here to avoid blocking the event loop.
-            # The thread will check the event and exit gracefully.
-            self.logger.info("已发送停止信号给音频发送线程。")
+        # Stop the writer task; queued requests are dropped with the connection.
+        await self._stop_writer()
 
         try:
-            if self.ws and self.ws.open:
+            if self.ws and _is_open(self.ws):
                 self.logger.info("正在发送 Stop 帧并关闭 WebSocket...")
                 # The "Stop" message is a Doubao-specific requirement.
-                await self.ws.send(json.dumps({"type": "Stop"}))
+                await self.ws.send(STOP_FRAME)
                 # Close the connection gracefully.
                 await self.ws.close(code=1000)
                 self.logger.info("WebSocket 后台关闭任务完成。")
@@ -212,19 +462,21 @@ class VoiceServiceClient:
 
     async def disconnect(self):
         """立即断开连接（非阻塞），将耗时的清理工作放到后台任务。"""
-        if not self.is_connected:
+        # 连接被远端关闭后 is_connected 已为 False，但写任务或 ws 仍可能需要清理
+        if not self.is_connected and self._writer_task is None and self.ws is None:
             self.logger.info("请求断开连接，但连接已断开。")
             return
         
         self.logger.info("请求断开连接，将立即返回并后台执行清理。")
         self.is_connected = False  # Prevent new operations immediately
-        
-        # Signal the sending thread to stop immediately.
-        self._stop_sending_event.set()
+        self.connected_event.clear()
 
         # Create a background task to do the actual slow network cleanup.
         # This allows the UI to be responsive immediately.
-        asyncio.create_task(self._cleanup_connection())
+        if self._cleanup_task is None or self._cleanup_task.done():
+            self._cleanup_task = asyncio.create_task(
+                self._cleanup_connection(), name="voice-cleanup"
+            )
 
         self.logger.info("断开连接请求已处理，UI 应立即响应。")
     
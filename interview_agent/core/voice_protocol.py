@@ -2,11 +2,38 @@
 语音协议处理模块 - 处理豆包语音服务的通信协议
 """
 
+import functools
 import gzip
 import json
-from typing import Dict, Any, Optional
+import struct
+import sys
+import zlib
+from typing import Any, Callable, Dict, Optional, Union
 from dataclasses import dataclass
 
+# 优先使用orjson进行JSON编解码，不可用时回退到标准库
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+
+# 优先使用libdeflate（deflate包）进行gzip压缩/解压，不可用时回退到标准库
+try:
+    import deflate
+    DEFLATE_AVAILABLE = True
+except ImportError:
+    deflate = None
+    DEFLATE_AVAILABLE = False
+
+# 音频数据可以是任意支持缓冲区协议的字节序列，避免调用方先转换为bytes
+AudioBuffer = Union[bytes, bytearray, memoryview]
+
 # 协议版本和头部配置
 PROTOCOL_VERSION = 0b0001
 DEFAULT_HEADER_SIZE = 0b0001
@@ -36,8 +63,49 @@ NO_COMPRESSION = 0b0000
 GZIP = 0b0001
 CUSTOM_COMPRESSION = 0b1111
 
+# 流式解压时每次交给回调的最大字节数
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+# 请求负载统一使用最低压缩级别：音频和JSON都很小，更高级别只增加延迟
+GZIP_LEVEL = 1
+
+if DEFLATE_AVAILABLE:
+    # deflate返回bytearray，统一转为bytes，保证返回类型与标准库一致（缓存结果也不可变）
+    def _gzip_compress(data: AudioBuffer) -> bytes:
+        return bytes(deflate.gzip_compress(data, GZIP_LEVEL))
+    
+    def _gzip_decompress(data: AudioBuffer) -> bytes:
+        return bytes(deflate.gzip_decompress(data))
+    
+    # 解压失败时可能抛出的异常，供调用方按单帧错误处理
+    DECOMPRESS_ERRORS = (EOFError, gzip.BadGzipFile, zlib.error, deflate.DeflateError)
+else:
+    def _gzip_compress(data: AudioBuffer) -> bytes:
+        # 固定mtime使压缩直接走单次zlib调用
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    
+    _gzip_decompress = gzip.decompress
+    DECOMPRESS_ERRORS = (EOFError, gzip.BadGzipFile, zlib.error)
+
+
+@functools.lru_cache(maxsize=16)
+def _compress_json_payload(payload_json: bytes) -> bytes:
+    """压缩JSON负载，相同配置（如重连时的会话配置）只压缩一次"""
+    return _gzip_compress(payload_json)
+
+
+# 预编译的大端32位结构：4字节头部按一个字整体读取，长度/事件等字段共用同一结构
+_U32 = struct.Struct("!I")
+_unpack_u32 = _U32.unpack_from
+_pack_header_bytes = struct.Struct("!BBBB").pack
+
+
+# Python 3.10+ 的dataclass支持生成__slots__，消息对象不再携带__dict__
+_DATACLASS_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
 
-@dataclass
+
+@dataclass(**_DATACLASS_OPTIONS)
 class VoiceMessage:
     """语音消息数据类"""
     message_type: str
@@ -49,6 +117,104 @@ class VoiceMessage:
     payload_size: int = 0
 
 
+@dataclass(**_DATACLASS_OPTIONS)
+class HeaderInfo:
+    """响应帧的头部和定长字段，负载尚未解压和反序列化"""
+    message_type: str
+    flags: int
+    serialization: int
+    compression: int
+    payload_offset: int
+    payload_size: int
+    session_id: str = ""
+    event: Optional[int] = None
+    seq: Optional[int] = None
+    code: Optional[int] = None
+
+
+def _decode_payload(payload_msg: memoryview, compression: int, serialization: int) -> Any:
+    """解压并反序列化负载"""
+    # 解压缩直接读取视图；未压缩时只按负载长度复制一次；空负载不经解压（deflate后端会报错）
+    if compression == GZIP and payload_msg:
+        payload_msg = _gzip_decompress(payload_msg)
+    else:
+        payload_msg = bytes(payload_msg)
+    
+    # 反序列化
+    if serialization == JSON:
+        return _json_loads(payload_msg)
+    if serialization != NO_SERIALIZATION:
+        return payload_msg.decode("utf-8")
+    return payload_msg
+
+
+def _read_full(
+    buf: bytes, pos: int, flags: int, compression: int, serialization: int,
+    message_type: str = 'SERVER_FULL_RESPONSE'
+) -> HeaderInfo:
+    """读取完整响应的字段：[序号] [事件] 会话ID长度 会话ID 负载长度"""
+    seq = event = None
+    if flags & NEG_SEQUENCE > 0:
+        seq = _unpack_u32(buf, pos)[0]
+        pos += 4
+    if flags & MSG_WITH_EVENT > 0:
+        event = _unpack_u32(buf, pos)[0]
+        pos += 4
+    
+    session_id_size = _unpack_u32(buf, pos)[0]
+    pos += 4
+    # 长度越界说明帧已损坏，继续读取会把后续字段全部读错
+    if session_id_size > len(buf) - pos - 4:
+        raise ValueError(f"会话ID长度超出帧范围: {session_id_size}")
+    session_id = buf[pos:pos + session_id_size].decode('utf-8') if session_id_size else ""
+    pos += session_id_size
+    payload_size = _unpack_u32(buf, pos)[0]
+    return HeaderInfo(
+        message_type, flags, serialization, compression,
+        pos + 4, payload_size, session_id, event, seq
+    )
+
+
+def _read_ack(buf: bytes, pos: int, flags: int, compression: int, serialization: int) -> HeaderInfo:
+    """读取确认响应的字段，布局与完整响应相同"""
+    return _read_full(buf, pos, flags, compression, serialization, 'SERVER_ACK')
+
+
+def _read_error(buf: bytes, pos: int, flags: int, compression: int, serialization: int) -> HeaderInfo:
+    """读取错误响应的字段：错误码 负载长度"""
+    return HeaderInfo(
+        'SERVER_ERROR', flags, serialization, compression,
+        pos + 8, _unpack_u32(buf, pos + 4)[0], code=_unpack_u32(buf, pos)[0]
+    )
+
+
+# 按消息类型分派字段读取函数
+_HANDLERS = {
+    SERVER_FULL_RESPONSE: _read_full,
+    SERVER_ACK: _read_ack,
+    SERVER_ERROR_RESPONSE: _read_error,
+}
+
+
+def _inflate_chunks(payload_msg: memoryview, on_chunk: Callable[[bytes], Any]) -> None:
+    """逐块解压gzip负载并交给回调，不在内存中拼出完整的解压结果"""
+    # 空负载没有音频，与非流式解析得到b""一致，不调用回调
+    if not payload_msg:
+        return
+    inflator = zlib.decompressobj(wbits=31)
+    data = payload_msg
+    while data and not inflator.eof:
+        chunk = inflator.decompress(data, STREAM_CHUNK_SIZE)
+        if chunk:
+            on_chunk(chunk)
+        data = inflator.unconsumed_tail
+    chunk = inflator.flush()
+    if chunk:
+        on_chunk(chunk)
+    if not inflator.eof:
+        raise EOFError("gzip负载不完整")
+
+
 class VoiceProtocolHandler:
     """语音协议处理器"""
     
@@ -61,150 +227,123 @@ class VoiceProtocolHandler:
         compression_type: int = GZIP,
         reserved_data: int = 0x00,
         extension_header: bytes = bytes()
-    ) -> bytearray:
+    ) -> bytes:
         """生成协议头部"""
-        header = bytearray()
-        header_size = int(len(extension_header) / 4) + 1
-        header.append((version << 4) | header_size)
-        header.append((message_type << 4) | message_type_specific_flags)
-        header.append((serial_method << 4) | compression_type)
-        header.append(reserved_data)
-        header.extend(extension_header)
-        return header
+        header_size = len(extension_header) // 4 + 1
+        header = _pack_header_bytes(
+            (version << 4) | header_size,
+            (message_type << 4) | message_type_specific_flags,
+            (serial_method << 4) | compression_type,
+            reserved_data
+        )
+        return header + extension_header if extension_header else header
+    
+    @staticmethod
+    def parse_header(response_data: bytes) -> Optional[HeaderInfo]:
+        """解析头部和定长字段，不处理负载；未知消息类型返回None（文本帧会抛出TypeError）"""
+        # 版本号、保留字段和头部扩展当前协议均未使用
+        word, = _unpack_u32(response_data)
+        handler = _HANDLERS.get((word >> 20) & 0x0f)
+        if handler is None:
+            return None
+        return handler(
+            response_data, ((word >> 24) & 0x0f) * 4, (word >> 16) & 0x0f,
+            (word >> 8) & 0x0f, (word >> 12) & 0x0f
+        )
+    
+    @staticmethod
+    def decode_payload(response_data: bytes, info: HeaderInfo) -> Any:
+        """按头部信息解压并反序列化负载"""
+        start = info.payload_offset
+        return _decode_payload(
+            memoryview(response_data)[start:start + info.payload_size],
+            info.compression, info.serialization
+        )
     
     @staticmethod
     def parse_response(response_data: bytes) -> VoiceMessage:
-        """解析服务器响应"""
-        if isinstance(response_data, str):
+        """解析服务器响应（parse_header + decode_payload）"""
+        info = VoiceProtocolHandler.parse_header(response_data)
+        if info is None:
             return VoiceMessage(message_type="UNKNOWN")
+        return VoiceMessage(
+            info.message_type, VoiceProtocolHandler.decode_payload(response_data, info),
+            info.session_id, info.event, info.seq, info.code, info.payload_size
+        )
+    
+    @staticmethod
+    def parse_response_streaming(
+        response_data: bytes, on_chunk: Callable[[bytes], Any]
+    ) -> VoiceMessage:
+        """解析服务器响应，gzip压缩的纯音频负载逐块解压后交给on_chunk
         
-        # 解析头部
-        protocol_version = response_data[0] >> 4
-        header_size = response_data[0] & 0x0f
-        message_type = response_data[1] >> 4
-        message_type_specific_flags = response_data[1] & 0x0f
-        serialization_method = response_data[2] >> 4
-        message_compression = response_data[2] & 0x0f
-        reserved = response_data[3]
-        header_extensions = response_data[4:header_size * 4]
-        payload = response_data[header_size * 4:]
-        
-        # 创建消息对象
-        message = VoiceMessage(message_type="UNKNOWN")
-        payload_msg = None
-        payload_size = 0
-        start = 0
-        
-        if message_type == SERVER_FULL_RESPONSE or message_type == SERVER_ACK:
-            message.message_type = 'SERVER_FULL_RESPONSE'
-            if message_type == SERVER_ACK:
-                message.message_type = 'SERVER_ACK'
-                
-            if message_type_specific_flags & NEG_SEQUENCE > 0:
-                message.seq = int.from_bytes(payload[:4], "big", signed=False)
-                start += 4
-                
-            if message_type_specific_flags & MSG_WITH_EVENT > 0:
-                message.event = int.from_bytes(payload[start:start+4], "big", signed=False)
-                start += 4
-                
-            payload = payload[start:]
-            session_id_size = int.from_bytes(payload[:4], "big", signed=True)
-            session_id = payload[4:4 + session_id_size]
-            message.session_id = session_id.decode('utf-8') if session_id else ""
-            payload = payload[4 + session_id_size:]
-            payload_size = int.from_bytes(payload[:4], "big", signed=False)
-            payload_msg = payload[4:]
-            
-        elif message_type == SERVER_ERROR_RESPONSE:
-            message.message_type = 'SERVER_ERROR'
-            message.code = int.from_bytes(payload[:4], "big", signed=False)
-            payload_size = int.from_bytes(payload[4:8], "big", signed=False)
-            payload_msg = payload[8:]
-        
-        if payload_msg is not None:
-            # 解压缩
-            if message_compression == GZIP:
-                payload_msg = gzip.decompress(payload_msg)
-            
-            # 反序列化
-            if serialization_method == JSON:
-                payload_msg = json.loads(str(payload_msg, "utf-8"))
-            elif serialization_method != NO_SERIALIZATION:
-                payload_msg = str(payload_msg, "utf-8")
-            
-            message.payload_msg = payload_msg
-            message.payload_size = payload_size
-        
-        return message
+        流式处理的消息payload_msg为None；其他消息与parse_response结果相同。
+        """
+        info = VoiceProtocolHandler.parse_header(response_data)
+        if info is None:
+            return VoiceMessage(message_type="UNKNOWN")
+        if (info.message_type != 'SERVER_ERROR' and info.serialization == NO_SERIALIZATION
+                and info.compression == GZIP):
+            start = info.payload_offset
+            _inflate_chunks(memoryview(response_data)[start:start + info.payload_size], on_chunk)
+            payload_msg = None
+        else:
+            payload_msg = VoiceProtocolHandler.decode_payload(response_data, info)
+        return VoiceMessage(
+            info.message_type, payload_msg, info.session_id,
+            info.event, info.seq, info.code, info.payload_size
+        )
     
     @staticmethod
-    def create_connection_request() -> bytearray:
+    def create_connection_request() -> bytes:
         """创建连接请求"""
-        request = bytearray(VoiceProtocolHandler.generate_header())
-        request.extend(int(1).to_bytes(4, 'big'))
-        payload_bytes = str.encode("{}")
-        payload_bytes = gzip.compress(payload_bytes)
-        request.extend((len(payload_bytes)).to_bytes(4, 'big'))
-        request.extend(payload_bytes)
-        return request
+        return b"".join((
+            _DEFAULT_HEADER, _EVENT_START_CONNECTION,
+            _EMPTY_JSON_GZIP_SIZE, _EMPTY_JSON_GZIP
+        ))
     
     @staticmethod
-    def create_session_request(session_id: str, config: Dict[str, Any]) -> bytearray:
+    def create_session_request(session_id: str, config: Dict[str, Any]) -> bytes:
         """创建会话请求"""
-        payload_bytes = str.encode(json.dumps(config))
-        payload_bytes = gzip.compress(payload_bytes)
-        request = bytearray(VoiceProtocolHandler.generate_header())
-        request.extend(int(100).to_bytes(4, 'big'))
-        request.extend((len(session_id)).to_bytes(4, 'big'))
-        request.extend(str.encode(session_id))
-        request.extend((len(payload_bytes)).to_bytes(4, 'big'))
-        request.extend(payload_bytes)
-        return request
+        payload_bytes = _compress_json_payload(_json_dumps(config))
+        session_id_bytes = session_id.encode()
+        return b"".join((
+            _DEFAULT_HEADER, _EVENT_START_SESSION,
+            len(session_id_bytes).to_bytes(4, 'big'), session_id_bytes,
+            len(payload_bytes).to_bytes(4, 'big'), payload_bytes
+        ))
     
     @staticmethod
-    def create_audio_request(session_id: str, audio_data: bytes) -> bytearray:
+    def create_audio_request(session_id: str, audio_data: AudioBuffer) -> bytes:
         """创建音频请求"""
-        request = bytearray(
-            VoiceProtocolHandler.generate_header(
-                message_type=CLIENT_AUDIO_ONLY_REQUEST,
-                serial_method=NO_SERIALIZATION
-            )
-        )
-        request.extend(int(200).to_bytes(4, 'big'))
-        request.extend((len(session_id)).to_bytes(4, 'big'))
-        request.extend(str.encode(session_id))
-        payload_bytes = gzip.compress(audio_data)
-        request.extend((len(payload_bytes)).to_bytes(4, 'big'))
-        request.extend(payload_bytes)
-        return request
+        session_id_bytes = session_id.encode()
+        payload_bytes = _gzip_compress(audio_data)
+        return b"".join((
+            _AUDIO_HEADER, _EVENT_TASK_REQUEST,
+            len(session_id_bytes).to_bytes(4, 'big'), session_id_bytes,
+            len(payload_bytes).to_bytes(4, 'big'), payload_bytes
+        ))
     
     @staticmethod
-    def create_finish_session_request(session_id: str) -> bytearray:
+    def create_finish_session_request(session_id: str) -> bytes:
         """创建结束会话请求"""
-        request = bytearray(VoiceProtocolHandler.generate_header())
-        request.extend(int(102).to_bytes(4, 'big'))
-        payload_bytes = str.encode("{}")
-        payload_bytes = gzip.compress(payload_bytes)
-        request.extend((len(session_id)).to_bytes(4, 'big'))
-        request.extend(str.encode(session_id))
-        request.extend((len(payload_bytes)).to_bytes(4, 'big'))
-        request.extend(payload_bytes)
-        return request
+        session_id_bytes = session_id.encode()
+        return b"".join((
+            _DEFAULT_HEADER, _EVENT_FINISH_SESSION,
+            len(session_id_bytes).to_bytes(4, 'big'), session_id_bytes,
+            _EMPTY_JSON_GZIP_SIZE, _EMPTY_JSON_GZIP
+        ))
     
     @staticmethod
-    def create_finish_connection_request() -> bytearray:
+    def create_finish_connection_request() -> bytes:
         """创建结束连接请求"""
-        request = bytearray(VoiceProtocolHandler.generate_header())
-        request.extend(int(2).to_bytes(4, 'big'))
-        payload_bytes = str.encode("{}")
-        payload_bytes = gzip.compress(payload_bytes)
-        request.extend((len(payload_bytes)).to_bytes(4, 'big'))
-        request.extend(payload_bytes)
-        return request
+        return b"".join((
+            _DEFAULT_HEADER, _EVENT_FINISH_CONNECTION,
+            _EMPTY_JSON_GZIP_SIZE, _EMPTY_JSON_GZIP
+        ))
     
     @staticmethod
-    def create_tts_request(session_id: str, text: str) -> bytearray:
+    def create_tts_request(session_id: str, text: str) -> bytes:
         """创建TTS（文本转语音）请求"""
         # 构建TTS配置
         tts_config = {
@@ -218,14 +357,66 @@ class VoiceProtocolHandler:
             }
         }
         
-        payload_bytes = str.encode(json.dumps(tts_config))
-        payload_bytes = gzip.compress(payload_bytes)
+        payload_bytes = _json_dumps(tts_config)
+        payload_bytes = _gzip_compress(payload_bytes)
         
         # 使用事件码101（TTS请求）
-        request = bytearray(VoiceProtocolHandler.generate_header())
-        request.extend(int(101).to_bytes(4, 'big'))  # 101是TTS事件码
-        request.extend((len(session_id)).to_bytes(4, 'big'))
-        request.extend(str.encode(session_id))
-        request.extend((len(payload_bytes)).to_bytes(4, 'big'))
-        request.extend(payload_bytes)
-        return request 
\ No newline at end of file
+        session_id_bytes = session_id.encode()
+        return b"".join((
+            _DEFAULT_HEADER, _EVENT_TTS,
+            len(session_id_bytes).to_bytes(4, 'big'), session_id_bytes,
+            len(payload_bytes).to_bytes(4, 'big'), payload_bytes
+        )) 
+
+
+class AudioFramer:
+    """音频请求帧构建器
+    
+    每个会话复用同一个缓冲区，头部、事件码和会话ID组成的固定前缀只写入一次，
+    之后每帧只写入负载长度和压缩后的音频。
+    """
+    
+    def __init__(self, session_id: str, initial_size: int = 4096):
+        session_id_bytes = session_id.encode()
+        prefix = b"".join((
+            _AUDIO_HEADER, _EVENT_TASK_REQUEST,
+            len(session_id_bytes).to_bytes(4, 'big'), session_id_bytes
+        ))
+        self._prefix_size = len(prefix)
+        self._buf = bytearray(max(initial_size, self._prefix_size + 4))
+        self._buf[:self._prefix_size] = prefix
+    
+    def frame(self, audio_data: AudioBuffer) -> memoryview:
+        """构建一帧音频请求，返回的视图在下一次调用前有效"""
+        payload_bytes = _gzip_compress(audio_data)
+        offset = self._prefix_size
+        size = offset + 4 + len(payload_bytes)
+        buf = self._buf
+        if len(buf) < size:
+            # 旧缓冲区可能仍被上一帧的视图引用，不能原地扩容，改为换用新缓冲区
+            new_buf = bytearray(size)
+            new_buf[:offset] = buf[:offset]
+            buf = self._buf = new_buf
+        _U32.pack_into(buf, offset, len(payload_bytes))
+        buf[offset + 4:size] = payload_bytes
+        return memoryview(buf)[:size]
+
+
+# 预先生成的请求片段，构建请求时直接拼接
+_DEFAULT_HEADER = VoiceProtocolHandler.generate_header()
+_AUDIO_HEADER = VoiceProtocolHandler.generate_header(
+    message_type=CLIENT_AUDIO_ONLY_REQUEST,
+    serial_method=NO_SERIALIZATION
+)
+
+# 事件码
+_EVENT_START_CONNECTION = (1).to_bytes(4, 'big')
+_EVENT_FINISH_CONNECTION = (2).to_bytes(4, 'big')
+_EVENT_START_SESSION = (100).to_bytes(4, 'big')
+_EVENT_TTS = (101).to_bytes(4, 'big')
+_EVENT_FINISH_SESSION = (102).to_bytes(4, 'big')
+_EVENT_TASK_REQUEST = (200).to_bytes(4, 'big')
+
+# 控制类请求的空JSON负载
+_EMPTY_JSON_GZIP = gzip.compress(b"{}")
+_EMPTY_JSON_GZIP_SIZE = len(_EMPTY_JSON_GZIP).to_bytes(4, 'big')
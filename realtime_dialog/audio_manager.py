@@ -10,6 +10,7 @@ import signal
 from dataclasses import dataclass
 
 import config
+import protocol
 from realtime_dialog_client import RealtimeDialogClient
 
 
@@ -105,6 +106,14 @@ class DialogSession:
                 print(f"音频播放错误: {e}")
                 time.sleep(0.1)
 
+    def _clear_audio_queue(self) -> None:
+        """一次性清空待播放音频，避免逐个出队"""
+        with self.audio_queue.mutex:
+            self.audio_queue.queue.clear()
+            self.audio_queue.unfinished_tasks = 0
+            self.audio_queue.all_tasks_done.notify_all()
+            self.audio_queue.not_full.notify_all()
+
     def handle_server_response(self, response: Dict[str, Any]) -> None:
         if response == {}:
             return
@@ -116,11 +125,7 @@ class DialogSession:
             print(f"服务器响应: {response}")
             if response['event'] == 450:
                 print(f"清空缓存音频: {response['session_id']}")
-                while not self.audio_queue.empty():
-                    try:
-                        self.audio_queue.get_nowait()
-                    except queue.Empty:
-                        continue
+                self._clear_audio_queue()
         elif response['message_type'] == 'SERVER_ERROR':
             print(f"服务器错误: {response['payload_msg']}")
             raise Exception("服务器错误")
@@ -134,7 +139,12 @@ class DialogSession:
     async def receive_loop(self):
         try:
             while True:
-                response = await self.client.receive_server_response()
+                frame = await self.client.receive_server_frame()
+                # 音频帧走快速路径直接入队，其余帧完整解析
+                if protocol.is_audio_response(frame):
+                    self.audio_queue.put(protocol.parse_audio_only(frame)[1])
+                    continue
+                response = protocol.parse_response(frame)
                 self.handle_server_response(response)
                 if 'event' in response and (response['event'] == 152 or response['event'] == 153):
                     print(f"receive session finished event: {response['event']}")
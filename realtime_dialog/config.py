@@ -9,21 +9,30 @@ current_dir = Path(__file__).parent
 project_root = current_dir.parent
 env_path = project_root / '.env'
 
-# 从项目根目录的 .env 文件加载环境变量
-load_dotenv(env_path)
+# 从项目根目录的 .env 文件加载环境变量，同一进程（含子进程）只加载一次
+if not os.environ.get("_DOTENV_LOADED"):
+    load_dotenv(env_path)
+    os.environ["_DOTENV_LOADED"] = "1"
 
 # 配置信息
-ws_connect_config = {
-    "base_url": "wss://openspeech.bytedance.com/api/v3/realtime/dialogue",
-    "headers": {
-        "X-Api-App-ID": os.getenv("VOLC_APP_ID", "YOUR_VOLC_APP_ID"),
-        "X-Api-Access-Key": os.getenv("VOLC_ACCESS_KEY", "YOUR_VOLC_ACCESS_KEY"),
-        "X-Api-Resource-Id": os.getenv("VOLC_RESOURCE_ID", "volc.speech.dialog"),
-        "X-Api-App-Key": "PlgvMymc7f3tQnJ6",  # 固定值，根据官方文档
-        "X-Api-Connect-Id": str(uuid.uuid4()),
-    }
+BASE_URL = "wss://openspeech.bytedance.com/api/v3/realtime/dialogue"
+
+_STATIC_HEADERS = {
+    "X-Api-App-ID": os.getenv("VOLC_APP_ID", "YOUR_VOLC_APP_ID"),
+    "X-Api-Access-Key": os.getenv("VOLC_ACCESS_KEY", "YOUR_VOLC_ACCESS_KEY"),
+    "X-Api-Resource-Id": os.getenv("VOLC_RESOURCE_ID", "volc.speech.dialog"),
+    "X-Api-App-Key": "PlgvMymc7f3tQnJ6",  # 固定值，根据官方文档
 }
 
+
+def make_ws_connect_config() -> dict:
+    """生成连接配置，每次连接使用新的 Connect-Id"""
+    return {
+        "base_url": BASE_URL,
+        "headers": {**_STATIC_HEADERS, "X-Api-Connect-Id": str(uuid.uuid4())},
+    }
+
+
 start_session_req = {
     "tts": {
         "audio_config": {
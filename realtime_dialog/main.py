@@ -4,7 +4,7 @@ import config
 from audio_manager import DialogSession
 
 async def main() -> None:
-    session = DialogSession(config.ws_connect_config)
+    session = DialogSession(config.make_ws_connect_config())
     await session.start()
 
 if __name__ == "__main__":
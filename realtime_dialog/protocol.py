@@ -1,5 +1,7 @@
 import gzip
 import json
+import struct
+from typing import Optional, Tuple
 
 PROTOCOL_VERSION = 0b0001
 DEFAULT_HEADER_SIZE = 0b0001
@@ -39,6 +41,9 @@ NO_COMPRESSION = 0b0000
 GZIP = 0b0001
 CUSTOM_COMPRESSION = 0b1111
 
+# 头部四个字节一次打包
+_HEADER_STRUCT = struct.Struct('!BBBB')
+
 
 def generate_header(
         version=PROTOCOL_VERSION,
@@ -56,14 +61,27 @@ def generate_header(
     reserved （8bits) 保留字段
     header_extensions 扩展头(大小等于 8 * 4 * (header_size - 1) )
     """
-    header = bytearray()
-    header_size = int(len(extension_header) / 4) + 1
-    header.append((version << 4) | header_size)
-    header.append((message_type << 4) | message_type_specific_flags)
-    header.append((serial_method << 4) | compression_type)
-    header.append(reserved_data)
-    header.extend(extension_header)
-    return header
+    header_size = len(extension_header) // 4 + 1
+    header = _HEADER_STRUCT.pack(
+        (version << 4) | header_size,
+        (message_type << 4) | message_type_specific_flags,
+        (serial_method << 4) | compression_type,
+        reserved_data
+    )
+    return header + extension_header if extension_header else header
+
+
+# 常用头部在导入时生成一次，发送请求时直接复用
+DEFAULT_HEADER = generate_header()
+AUDIO_HEADER = generate_header(message_type=CLIENT_AUDIO_ONLY_REQUEST,
+                               serial_method=NO_SERIALIZATION)
+
+# 预先编码的事件号
+EVENT_START_CONNECTION = (1).to_bytes(4, 'big')
+EVENT_FINISH_CONNECTION = (2).to_bytes(4, 'big')
+EVENT_START_SESSION = (100).to_bytes(4, 'big')
+EVENT_FINISH_SESSION = (102).to_bytes(4, 'big')
+EVENT_TASK_REQUEST = (200).to_bytes(4, 'big')
 
 
 def parse_response(res):
@@ -87,49 +105,80 @@ def parse_response(res):
     """
     if isinstance(res, str):
         return {}
-    protocol_version = res[0] >> 4
     header_size = res[0] & 0x0f
     message_type = res[1] >> 4
     message_type_specific_flags = res[1] & 0x0f
     serialization_method = res[2] >> 4
     message_compression = res[2] & 0x0f
-    reserved = res[3]
-    header_extensions = res[4:header_size * 4]
-    payload = res[header_size * 4:]
     result = {}
     payload_msg = None
     payload_size = 0
-    start = 0
+    # 用游标在原始数据上读取字段，负载只按长度复制一次
+    pos = header_size * 4
     if message_type == SERVER_FULL_RESPONSE or message_type == SERVER_ACK:
         result['message_type'] = 'SERVER_FULL_RESPONSE'
         if message_type == SERVER_ACK:
             result['message_type'] = 'SERVER_ACK'
         if message_type_specific_flags & NEG_SEQUENCE > 0:
-            result['seq'] = int.from_bytes(payload[:4], "big", signed=False)
-            start += 4
+            result['seq'] = int.from_bytes(res[pos:pos + 4], "big", signed=False)
+            pos += 4
         if message_type_specific_flags & MSG_WITH_EVENT > 0:
-            result['event'] = int.from_bytes(payload[:4], "big", signed=False)
-            start += 4
-        payload = payload[start:]
-        session_id_size = int.from_bytes(payload[:4], "big", signed=True)
-        session_id = payload[4:session_id_size]
-        result['session_id'] = str(session_id)
-        payload = payload[4 + session_id_size:]
-        payload_size = int.from_bytes(payload[:4], "big", signed=False)
-        payload_msg = payload[4:]
+            result['event'] = int.from_bytes(res[pos:pos + 4], "big", signed=False)
+            pos += 4
+        session_id_size = int.from_bytes(res[pos:pos + 4], "big", signed=False)
+        pos += 4
+        if session_id_size > len(res) - pos - 4:
+            raise ValueError(f"session id size out of range: {session_id_size}")
+        result['session_id'] = res[pos:pos + session_id_size].decode('utf-8')
+        pos += session_id_size
+        payload_size = int.from_bytes(res[pos:pos + 4], "big", signed=False)
+        pos += 4
+        payload_msg = memoryview(res)[pos:pos + payload_size]
     elif message_type == SERVER_ERROR_RESPONSE:
-        code = int.from_bytes(payload[:4], "big", signed=False)
+        code = int.from_bytes(res[pos:pos + 4], "big", signed=False)
         result['code'] = code
-        payload_size = int.from_bytes(payload[4:8], "big", signed=False)
-        payload_msg = payload[8:]
+        payload_size = int.from_bytes(res[pos + 4:pos + 8], "big", signed=False)
+        payload_msg = memoryview(res)[pos + 8:pos + 8 + payload_size]
     if payload_msg is None:
         return result
     if message_compression == GZIP:
         payload_msg = gzip.decompress(payload_msg)
+    else:
+        payload_msg = bytes(payload_msg)
     if serialization_method == JSON:
-        payload_msg = json.loads(str(payload_msg, "utf-8"))
+        payload_msg = json.loads(payload_msg)
     elif serialization_method != NO_SERIALIZATION:
-        payload_msg = str(payload_msg, "utf-8")
+        payload_msg = payload_msg.decode("utf-8")
     result['payload_msg'] = payload_msg
     result['payload_size'] = payload_size
     return result
+
+
+def is_audio_response(res) -> bool:
+    """只看头部判断是否为纯音频响应（SERVER_ACK且负载未序列化）"""
+    return isinstance(res, bytes) and res[1] >> 4 == SERVER_ACK and res[2] >> 4 == NO_SERIALIZATION
+
+
+def parse_audio_only(res: bytes) -> Tuple[Optional[int], bytes]:
+    """
+    音频响应的快速解析路径，只返回(event, 音频数据)，不构造结果字典。
+    调用前需用is_audio_response确认帧类型。
+    """
+    header_size = res[0] & 0x0f
+    flags = res[1] & 0x0f
+    pos = header_size * 4
+    event = None
+    if flags & NEG_SEQUENCE > 0:
+        pos += 4
+    if flags & MSG_WITH_EVENT > 0:
+        event = int.from_bytes(res[pos:pos + 4], "big", signed=False)
+        pos += 4
+    session_id_size = int.from_bytes(res[pos:pos + 4], "big", signed=False)
+    if session_id_size > len(res) - pos - 8:
+        raise ValueError(f"session id size out of range: {session_id_size}")
+    pos += 4 + session_id_size
+    payload_size = int.from_bytes(res[pos:pos + 4], "big", signed=False)
+    pos += 4
+    if res[2] & 0x0f == GZIP:
+        return event, gzip.decompress(memoryview(res)[pos:pos + payload_size])
+    return event, res[pos:pos + payload_size]
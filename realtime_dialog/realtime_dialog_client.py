@@ -14,6 +14,7 @@ class RealtimeDialogClient:
         self.config = config
         self.logid = ""
         self.session_id = session_id
+        self.session_id_bytes = session_id.encode()
         self.ws = None
 
     async def connect(self) -> None:
@@ -28,11 +29,11 @@ class RealtimeDialogClient:
         print(f"dialog server response logid: {self.logid}")
 
         # StartConnection request
-        start_connection_request = bytearray(protocol.generate_header())
-        start_connection_request.extend(int(1).to_bytes(4, 'big'))
-        payload_bytes = str.encode("{}")
+        start_connection_request = bytearray(protocol.DEFAULT_HEADER)
+        start_connection_request.extend(protocol.EVENT_START_CONNECTION)
+        payload_bytes = b"{}"
         payload_bytes = gzip.compress(payload_bytes)
-        start_connection_request.extend((len(payload_bytes)).to_bytes(4, 'big'))
+        start_connection_request.extend(len(payload_bytes).to_bytes(4, 'big'))
         start_connection_request.extend(payload_bytes)
         await self.ws.send(start_connection_request)
         response = await self.ws.recv()
@@ -40,55 +41,60 @@ class RealtimeDialogClient:
 
         # StartSession request
         request_params = config.start_session_req
-        payload_bytes = str.encode(json.dumps(request_params))
+        payload_bytes = json.dumps(request_params).encode()
         payload_bytes = gzip.compress(payload_bytes)
-        start_session_request = bytearray(protocol.generate_header())
-        start_session_request.extend(int(100).to_bytes(4, 'big'))
-        start_session_request.extend((len(self.session_id)).to_bytes(4, 'big'))
-        start_session_request.extend(str.encode(self.session_id))
-        start_session_request.extend((len(payload_bytes)).to_bytes(4, 'big'))
+        start_session_request = bytearray(protocol.DEFAULT_HEADER)
+        start_session_request.extend(protocol.EVENT_START_SESSION)
+        start_session_request.extend(len(self.session_id_bytes).to_bytes(4, 'big'))
+        start_session_request.extend(self.session_id_bytes)
+        start_session_request.extend(len(payload_bytes).to_bytes(4, 'big'))
         start_session_request.extend(payload_bytes)
         await self.ws.send(start_session_request)
         response = await self.ws.recv()
         print(f"StartSession response: {protocol.parse_response(response)}")
 
     async def task_request(self, audio: bytes) -> None:
-        task_request = bytearray(
-            protocol.generate_header(message_type=protocol.CLIENT_AUDIO_ONLY_REQUEST,
-                                     serial_method=protocol.NO_SERIALIZATION))
-        task_request.extend(int(200).to_bytes(4, 'big'))
-        task_request.extend((len(self.session_id)).to_bytes(4, 'big'))
-        task_request.extend(str.encode(self.session_id))
+        task_request = bytearray(protocol.AUDIO_HEADER)
+        task_request.extend(protocol.EVENT_TASK_REQUEST)
+        task_request.extend(len(self.session_id_bytes).to_bytes(4, 'big'))
+        task_request.extend(self.session_id_bytes)
         payload_bytes = gzip.compress(audio)
-        task_request.extend((len(payload_bytes)).to_bytes(4, 'big'))  # payload size(4 bytes)
+        task_request.extend(len(payload_bytes).to_bytes(4, 'big'))  # payload size(4 bytes)
         task_request.extend(payload_bytes)
         await self.ws.send(task_request)
 
+    async def receive_server_frame(self) -> bytes:
+        """接收一帧原始响应，由调用方决定解析方式"""
+        try:
+            return await self.ws.recv()
+        except Exception as e:
+            raise Exception(f"Failed to receive message: {e}")
+
     async def receive_server_response(self) -> Dict[str, Any]:
+        response = await self.receive_server_frame()
         try:
-            response = await self.ws.recv()
             data = protocol.parse_response(response)
             return data
         except Exception as e:
             raise Exception(f"Failed to receive message: {e}")
 
     async def finish_session(self):
-        finish_session_request = bytearray(protocol.generate_header())
-        finish_session_request.extend(int(102).to_bytes(4, 'big'))
-        payload_bytes = str.encode("{}")
+        finish_session_request = bytearray(protocol.DEFAULT_HEADER)
+        finish_session_request.extend(protocol.EVENT_FINISH_SESSION)
+        payload_bytes = b"{}"
         payload_bytes = gzip.compress(payload_bytes)
-        finish_session_request.extend((len(self.session_id)).to_bytes(4, 'big'))
-        finish_session_request.extend(str.encode(self.session_id))
-        finish_session_request.extend((len(payload_bytes)).to_bytes(4, 'big'))
+        finish_session_request.extend(len(self.session_id_bytes).to_bytes(4, 'big'))
+        finish_session_request.extend(self.session_id_bytes)
+        finish_session_request.extend(len(payload_bytes).to_bytes(4, 'big'))
         finish_session_request.extend(payload_bytes)
         await self.ws.send(finish_session_request)
 
     async def finish_connection(self):
-        finish_connection_request = bytearray(protocol.generate_header())
-        finish_connection_request.extend(int(2).to_bytes(4, 'big'))
-        payload_bytes = str.encode("{}")
+        finish_connection_request = bytearray(protocol.DEFAULT_HEADER)
+        finish_connection_request.extend(protocol.EVENT_FINISH_CONNECTION)
+        payload_bytes = b"{}"
         payload_bytes = gzip.compress(payload_bytes)
-        finish_connection_request.extend((len(payload_bytes)).to_bytes(4, 'big'))
+        finish_connection_request.extend(len(payload_bytes).to_bytes(4, 'big'))
         finish_connection_request.extend(payload_bytes)
         await self.ws.send(finish_connection_request)
         response = await self.ws.recv()
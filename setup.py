@@ -18,4 +18,7 @@ setup(
         "numpy>=1.21.0",
         "sentence-transformers>=2.2.0",
     ],
+    extras_require={
+        "fast": ["deflate>=0.5.0"],
+    },
 ) 
\ No newline at end of file
@@ -0,0 +1,27 @@
+"""语音协议解析测试"""
+
+from interview_agent.core.voice_protocol import VoiceProtocolHandler
+
+
+def _audio_frame(payload: bytes, event: int = 352) -> bytes:
+    """构造gzip压缩的纯音频SERVER_ACK帧"""
+    return b"".join((
+        bytes([0x11, 0xb4, 0x01, 0x00]),
+        event.to_bytes(4, "big"),
+        (3).to_bytes(4, "big"), b"abc",
+        len(payload).to_bytes(4, "big"), payload,
+    ))
+
+
+def test_streaming_empty_gzip_audio_payload():
+    """空音频负载不调用回调，且保留事件号，与非流式解析结果一致"""
+    frame = _audio_frame(b"", event=152)
+    chunks = []
+
+    message = VoiceProtocolHandler.parse_response_streaming(frame, chunks.append)
+
+    assert chunks == []
+    assert message.message_type == "SERVER_ACK"
+    assert message.event == 152
+    assert message.payload_size == 0
+    assert VoiceProtocolHandler.parse_response(frame).payload_msg == b""